@@ -45,10 +45,12 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "restaurant.middleware.JSONCompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "restaurant.middleware.ProfilingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -131,6 +133,17 @@ STATIC_URL = "static/"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# JSON responses smaller than this are sent uncompressed
+COMPRESSION_MIN_SIZE = 1024
+
+# profile 1 in PROFILING_SAMPLE_RATE requests (0 is off), staff can also ask
+# for a single request with the header; report with `manage.py profile_report`
+PROFILING_SAMPLE_RATE = 0
+PROFILING_HEADER = "X-Profile"
+PROFILING_DIR = BASE_DIR / "profiles"
+
+# receipts and order notifications are sent by the run_tasks worker
+EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 
 DJOSER = {"USER_ID_FIELD": "username"}
 
@@ -2,5 +2,8 @@ from django.apps import AppConfig
 
 
 class RestaurantConfig(AppConfig):
-    default_auto_field = 'django.db.models.BigAutoField'
-    name = 'restaurant'
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "restaurant"
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,45 @@
+from django.db import transaction
+from .models import Order, OrderItem, ArchivedOrder, ArchivedOrderItem
+
+ARCHIVE_BATCH_SIZE = 500
+ORDER_FIELDS = ["id", "user_id", "delivery_crew_id", "status", "total", "date"]
+ITEM_FIELDS = ["id", "order_id", "menuitem_id", "quantity", "unit_price", "price"]
+
+
+def archive_batch(cutoff, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Move up to `batch_size` delivered orders dated before `cutoff`, with their
+    items, into the archive tables. Returns the number of orders moved.
+
+    Each batch is one transaction, so an interrupted run leaves every order
+    either fully hot or fully archived and the next run carries on from there.
+    """
+    with transaction.atomic():
+        ids = list(
+            Order.objects.select_for_update()
+            .filter(status=True, date__lt=cutoff)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0
+        orders = list(Order.objects.filter(pk__in=ids).values(*ORDER_FIELDS))
+        items = list(OrderItem.objects.filter(order__in=ids).values(*ITEM_FIELDS))
+        # an id already in the archive raises and rolls the batch back, the
+        # hot rows must never be deleted unless their copy was written
+        ArchivedOrder.objects.bulk_create([ArchivedOrder(**row) for row in orders])
+        ArchivedOrderItem.objects.bulk_create(
+            [ArchivedOrderItem(**row) for row in items]
+        )
+        OrderItem.objects.filter(pk__in=[row["id"] for row in items]).delete()
+        Order.objects.filter(pk__in=[row["id"] for row in orders]).delete()
+    return len(orders)
+
+
+def archive_orders(cutoff, batch_size=ARCHIVE_BATCH_SIZE):
+    """Archive every delivered order before `cutoff`, yielding per batch."""
+    while True:
+        moved = archive_batch(cutoff, batch_size)
+        if not moved:
+            return
+        yield moved
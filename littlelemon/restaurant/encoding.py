@@ -0,0 +1,23 @@
+def accepts_encoding(header, coding):
+    """
+    Whether an Accept-Encoding header allows `coding`.
+
+    Honours q-values, so "gzip;q=0" refuses gzip, and falls back to "*"
+    when the coding isn't listed.
+    """
+    qvalues = {}
+    for part in header.split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qvalues[name] = q
+    return qvalues.get(coding, qvalues.get("*", 0)) > 0
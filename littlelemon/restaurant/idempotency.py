@@ -0,0 +1,91 @@
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from .models import IdempotencyKey
+
+IDEMPOTENCY_KEY_TTL = getattr(settings, "IDEMPOTENCY_KEY_TTL", timedelta(hours=24))
+
+
+def _request_hash(request):
+    # what the key was first used for: the full path and the parsed body
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(
+        f"{request.method} {request.get_full_path()}\n{body}".encode()
+    ).hexdigest()
+
+
+def _lock_key(user, key, endpoint, request_hash):
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(
+                user=user, key=key, endpoint=endpoint, request_hash=request_hash
+            )
+    except IntegrityError:
+        # a concurrent request with the same key blocks the insert until it
+        # commits; the locking read then sees its stored response
+        return IdempotencyKey.objects.select_for_update().get(
+            user=user, key=key, endpoint=endpoint
+        )
+
+
+def purge_expired_keys():
+    """Delete stored responses older than IDEMPOTENCY_KEY_TTL."""
+    cutoff = timezone.now() - IDEMPOTENCY_KEY_TTL
+    return IdempotencyKey.objects.filter(created__lt=cutoff).delete()[0]
+
+
+def idempotent(handler):
+    """
+    Honour the Idempotency-Key header on an APIView handler.
+
+    The first request with a key runs the handler and stores its response in
+    the same transaction; retries with that key replay the stored response
+    without running the handler again. Server errors aren't stored. Reusing
+    a key for a different request is refused with 422.
+    """
+
+    @wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get("Idempotency-Key")
+        if not key:
+            return handler(self, request, *args, **kwargs)
+        if len(key) > 64:
+            return Response(
+                {"message": "Idempotency-Key is longer than 64 characters"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        endpoint = f"{request.method} {request.path}"[:100]
+        request_hash = _request_hash(request)
+        with transaction.atomic():
+            record = _lock_key(request.user, key, endpoint, request_hash)
+            expired = record.created < timezone.now() - IDEMPOTENCY_KEY_TTL
+            if expired:
+                record.request_hash = request_hash
+            elif record.request_hash != request_hash:
+                return Response(
+                    {"message": "Idempotency-Key was used for a different request"},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+            elif record.status_code is not None:
+                return Response(
+                    record.response,
+                    status=record.status_code,
+                    headers={"Idempotent-Replayed": "true"},
+                )
+            response = handler(self, request, *args, **kwargs)
+            if response.status_code >= 500:
+                record.delete()
+            else:
+                record.status_code = response.status_code
+                record.response = response.data
+                record.created = timezone.now()
+                record.save()
+        return response
+
+    return wrapper
@@ -0,0 +1,67 @@
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from .models import MenuItem
+
+
+def _per_item(quantities):
+    # CASE id WHEN ... THEN qty END, so one statement can carry every line
+    return Case(
+        *[When(pk=pk, then=Value(qty)) for pk, qty in quantities.items()],
+        output_field=IntegerField(),
+    )
+
+
+def _take(quantities):
+    # UPDATE ... SET inventory = inventory - qty WHERE inventory >= qty
+    # items with a NULL inventory are not stock tracked and always pass
+    return (
+        MenuItem.objects.filter(pk__in=quantities)
+        .filter(Q(inventory__isnull=True) | Q(inventory__gte=_per_item(quantities)))
+        .update(inventory=F("inventory") - _per_item(quantities))
+    )
+
+
+def reserve_stock(quantities):
+    """
+    Reserve stock for a {menuitem_id: quantity} mapping.
+
+    Call it inside the checkout transaction so a failed checkout gives the
+    stock back. Returns the set of menu item ids that could not be reserved;
+    every other line has been taken from inventory. Lines with a quantity
+    below one are always rejected, they would put stock back.
+    """
+    invalid = {pk for pk, qty in quantities.items() if qty < 1}
+    quantities = {pk: qty for pk, qty in quantities.items() if pk not in invalid}
+    if not quantities:
+        return invalid
+    with transaction.atomic():
+        sid = transaction.savepoint()
+        if _take(quantities) == len(quantities):
+            transaction.savepoint_commit(sid)
+            return invalid
+        # at least one line is short (or gone): undo and retry with the lines
+        # that can actually be served, holding the rows so they can't move
+        transaction.savepoint_rollback(sid)
+        stock = dict(
+            MenuItem.objects.select_for_update()
+            .filter(pk__in=quantities)
+            .values_list("pk", "inventory")
+        )
+        short = {
+            pk
+            for pk, qty in quantities.items()
+            if pk not in stock or (stock[pk] is not None and stock[pk] < qty)
+        }
+        available = {pk: qty for pk, qty in quantities.items() if pk not in short}
+        if available:
+            _take(available)
+        return short | invalid
+
+
+def release_stock(quantities):
+    """Put a {menuitem_id: quantity} mapping back into inventory."""
+    if not quantities:
+        return 0
+    return MenuItem.objects.filter(pk__in=quantities, inventory__isnull=False).update(
+        inventory=F("inventory") + _per_item(quantities)
+    )
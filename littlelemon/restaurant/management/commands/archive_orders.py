@@ -0,0 +1,26 @@
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+from restaurant.archive import archive_orders, ARCHIVE_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Move delivered orders older than N days into the archive tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=90)
+        parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        cutoff = date.today() - timedelta(days=options["days"])
+        total = 0
+        try:
+            for moved in archive_orders(cutoff, options["batch_size"]):
+                total += moved
+                self.stdout.write(f"archived {total} orders")
+        except IntegrityError as e:
+            raise CommandError(
+                f"stopped after {total} orders, the next batch clashes "
+                f"with rows already in the archive: {e}"
+            )
+        self.stdout.write(f"done, {total} orders dated before {cutoff} archived")
@@ -0,0 +1,74 @@
+import os
+from collections import Counter
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from restaurant.profiling import read_collapsed, write_collapsed
+
+
+class Command(BaseCommand):
+    help = "Summarise the profiles written by ProfilingMiddleware into hotspots"
+
+    def add_arguments(self, parser):
+        parser.add_argument("views", nargs="*", help="view names, default all")
+        parser.add_argument("--dir", default=getattr(settings, "PROFILING_DIR", None))
+        parser.add_argument("--top", type=int, default=15)
+        parser.add_argument(
+            "--merge-to",
+            help="also write every profile of a view into one collapsed file here",
+        )
+
+    def handle(self, *args, **options):
+        directory = options["dir"]
+        if not directory or not os.path.isdir(directory):
+            raise CommandError(f"no profiles in {directory}")
+        # one directory per view, anything else in there isn't ours
+        known = sorted(
+            name
+            for name in os.listdir(directory)
+            if os.path.isdir(os.path.join(directory, name))
+        )
+        unknown = sorted(set(options["views"]) - set(known))
+        if unknown:
+            raise CommandError(f"no profiles in {directory} for {', '.join(unknown)}")
+        for view in options["views"] or known:
+            view_dir = os.path.join(directory, view)
+            files = [
+                os.path.join(view_dir, name)
+                for name in sorted(os.listdir(view_dir))
+                if name.endswith(".collapsed")
+            ]
+            if not files:
+                continue
+            stacks = Counter()
+            for path in files:
+                stacks.update(read_collapsed(path))
+            self.report(view, len(files), stacks, options["top"])
+            if options["merge_to"]:
+                os.makedirs(options["merge_to"], exist_ok=True)
+                write_collapsed(
+                    stacks, os.path.join(options["merge_to"], f"{view}.collapsed")
+                )
+
+    def report(self, view, requests, stacks, top):
+        own = Counter()
+        inclusive = Counter()
+        for stack, value in stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += value
+            # a recursive frame only counts once per stack
+            for frame in set(frames):
+                inclusive[frame] += value
+        total = sum(stacks.values()) or 1
+        self.stdout.write(
+            "{}: {} requests, {:.1f} ms per request".format(
+                view, requests, total / requests / 1000
+            )
+        )
+        for title, counter in (("self", own), ("total", inclusive)):
+            self.stdout.write(f"  top {title} time")
+            for frame, value in counter.most_common(top):
+                self.stdout.write(
+                    "    {:>9.1f} ms {:>5.1f}%  {}".format(
+                        value / 1000, 100 * value / total, frame
+                    )
+                )
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from restaurant.idempotency import purge_expired_keys
+
+
+class Command(BaseCommand):
+    help = "Delete stored Idempotency-Key responses older than their TTL"
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"purged {purge_expired_keys()} idempotency keys")
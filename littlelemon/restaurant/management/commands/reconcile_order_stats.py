@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from restaurant.stats import reconcile_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-user order counters from the order tables"
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"reconciled order stats for {reconcile_stats()} users")
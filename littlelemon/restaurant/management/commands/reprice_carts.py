@@ -0,0 +1,24 @@
+from time import perf_counter
+from django.core.management.base import BaseCommand
+from restaurant.pricing import reprice_carts, REPRICE_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = "Refresh cart price snapshots from the current menu item prices"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--menuitem",
+            type=int,
+            action="append",
+            dest="menuitems",
+            help="only reprice carts holding this menu item (repeatable)",
+        )
+        parser.add_argument("--chunk-size", type=int, default=REPRICE_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        started = perf_counter()
+        updated = reprice_carts(options["menuitems"], options["chunk_size"])
+        self.stdout.write(
+            "repriced {} carts in {:.2f}s".format(updated, perf_counter() - started)
+        )
@@ -0,0 +1,31 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from django.core.management.base import BaseCommand
+from restaurant.tasks import claim, run
+
+
+class Command(BaseCommand):
+    help = "Run queued background tasks with a pool of worker threads"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=4)
+        parser.add_argument(
+            "--poll", type=float, default=1.0, help="seconds to sleep when idle"
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="exit once the queue is drained"
+        )
+
+    def handle(self, *args, **options):
+        threads = options["threads"]
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            while True:
+                claimed = claim(threads)
+                if claimed:
+                    done, _ = wait([pool.submit(run, *task) for task in claimed])
+                    failed = sum(1 for future in done if not future.result())
+                    self.stdout.write(f"ran {len(claimed)} tasks, {failed} failed")
+                elif options["once"]:
+                    return
+                else:
+                    time.sleep(options["poll"])
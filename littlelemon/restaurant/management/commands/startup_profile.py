@@ -0,0 +1,93 @@
+import json
+import os
+import subprocess
+import sys
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_MODULES = ["littlelemon.urls", "restaurant.views", "restaurant.serializers"]
+
+# run in a fresh interpreter so nothing is imported yet; everything after the
+# marker on stderr is the -X importtime output for the module being measured
+CHILD = """
+import importlib, json, sys, time
+import django
+django.setup()
+from django.db import connection
+queries = []
+def count(execute, sql, params, many, context):
+    queries.append(sql)
+    return execute(sql, params, many, context)
+sys.stderr.write("-- import --\\n")
+sys.stderr.flush()
+with connection.execute_wrapper(count):
+    started = time.perf_counter()
+    importlib.import_module(sys.argv[1])
+    seconds = time.perf_counter() - started
+print(json.dumps({"seconds": seconds, "queries": len(queries)}))
+"""
+
+
+def parse_importtime(output):
+    """Return [(self_us, cumulative_us, module)] from -X importtime output."""
+    rows = []
+    seen_marker = False
+    for line in output.splitlines():
+        if line == "-- import --":
+            seen_marker = True
+            continue
+        if not seen_marker or not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # the header line
+        rows.append((int(fields[0]), int(fields[1]), fields[2].strip()))
+    return rows
+
+
+class Command(BaseCommand):
+    help = "Measure the cold import time of the URLconf, views and serializers"
+
+    def add_arguments(self, parser):
+        parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+        parser.add_argument(
+            "--top", type=int, default=10, help="how many heavy modules to list"
+        )
+
+    def handle(self, *args, **options):
+        env = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": os.environ.get(
+                "DJANGO_SETTINGS_MODULE", settings.SETTINGS_MODULE
+            ),
+        }
+        failed = False
+        for module in options["modules"]:
+            child = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", CHILD, module],
+                cwd=settings.BASE_DIR,
+                env=env,
+                capture_output=True,
+                text=True,
+            )
+            if child.returncode:
+                self.stderr.write(f"{module}: import failed\n{child.stderr[-2000:]}")
+                failed = True
+                continue
+            result = json.loads(child.stdout.strip().splitlines()[-1])
+            self.stdout.write(
+                "{}: {:.1f} ms, {} db queries".format(
+                    module, result["seconds"] * 1000, result["queries"]
+                )
+            )
+            if result["queries"]:
+                failed = True
+            heaviest = sorted(parse_importtime(child.stderr), reverse=True)
+            for self_us, cumulative_us, name in heaviest[: options["top"]]:
+                self.stdout.write(
+                    "    {:>8.1f} ms self {:>8.1f} ms total  {}".format(
+                        self_us / 1000, cumulative_us / 1000, name
+                    )
+                )
+        if failed:
+            raise CommandError("some modules failed to import or queried the db")
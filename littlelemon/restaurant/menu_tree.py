@@ -0,0 +1,81 @@
+import gzip
+import hashlib
+import json
+import threading
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from .models import MenuItem, MenuVersion
+
+_lock = threading.Lock()
+# (menu version, etag, json bytes, gzipped json bytes), rebuilt whenever the
+# version in the database moves on, whichever worker changed the menu
+_tree = None
+
+
+def menu_version():
+    return MenuVersion.objects.filter(pk=1).values_list("version", flat=True).first()
+
+
+def bump_menu_version():
+    """
+    Mark the menu tree stale in every worker. Call it in the transaction
+    that changes the menu, so the new version commits with the change.
+    """
+    if MenuVersion.objects.filter(pk=1).update(version=F("version") + 1):
+        return
+    _, created = MenuVersion.objects.get_or_create(pk=1, defaults={"version": 1})
+    if not created:
+        MenuVersion.objects.filter(pk=1).update(version=F("version") + 1)
+
+
+def build_menu_tree():
+    """Encode the catalogue as a category -> items tree from one query."""
+    categories = {}
+    items = MenuItem.objects.select_related("category").order_by(
+        "category__title", "title"
+    )
+    for item in items:
+        category = categories.setdefault(
+            item.category_id,
+            {
+                "id": item.category_id,
+                "slug": item.category.slug,
+                "title": item.category.title,
+                "items": [],
+            },
+        )
+        category["items"].append(
+            {
+                "id": item.pk,
+                "title": item.title,
+                "price": item.price,
+                "featured": item.featured,
+            }
+        )
+    body = json.dumps(
+        list(categories.values()), cls=DjangoJSONEncoder, separators=(",", ":")
+    ).encode()
+    etag = '"%s"' % hashlib.md5(body).hexdigest()
+    return etag, body, gzip.compress(body)
+
+
+def get_menu_tree():
+    """Return (etag, body, gzipped body), rebuilt if the menu has changed."""
+    global _tree
+    # one primary key lookup per request tells whether the tree is current
+    version = menu_version()
+    tree = _tree
+    if tree is None or tree[0] != version:
+        with _lock:
+            if _tree is None or _tree[0] != version:
+                _tree = (version, *build_menu_tree())
+            tree = _tree
+    return tree[1:]
+
+
+def refresh_menu_tree():
+    """Drop the cached tree and build the new one straight away."""
+    global _tree
+    with _lock:
+        _tree = None
+    get_menu_tree()
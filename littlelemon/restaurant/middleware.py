@@ -0,0 +1,94 @@
+import cProfile
+import os
+import random
+import time
+import uuid
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from .encoding import accepts_encoding
+from .profiling import collapse, write_collapsed
+
+COMPRESSION_MIN_SIZE = getattr(settings, "COMPRESSION_MIN_SIZE", 1024)
+
+
+class JSONCompressionMiddleware(GZipMiddleware):
+    """
+    Gzip JSON responses bigger than COMPRESSION_MIN_SIZE bytes.
+
+    Django's GZipMiddleware does the compression, with its BREACH padding
+    and weak ETags; this only narrows it to JSON and honours q-values in
+    Accept-Encoding, so "gzip;q=0" gets the plain body.
+    """
+
+    def process_response(self, request, response):
+        if (
+            response.streaming
+            or not response.get("Content-Type", "").startswith("application/json")
+            or len(response.content) < COMPRESSION_MIN_SIZE
+        ):
+            return response
+        if not accepts_encoding(request.headers.get("Accept-Encoding", ""), "gzip"):
+            if not response.has_header("Content-Encoding"):
+                patch_vary_headers(response, ("Accept-Encoding",))
+            return response
+        return super().process_response(request, response)
+
+
+class ProfilingMiddleware:
+    """
+    Run sampled requests under cProfile and write their collapsed stacks to
+    PROFILING_DIR/<view name>/, ready for flamegraph.pl or speedscope.
+
+    One in PROFILING_SAMPLE_RATE requests is profiled (0 turns sampling off),
+    as is any request from a staff user that sends the PROFILING_HEADER.
+    The header is checked against the session user, so it needs to come
+    after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, "PROFILING_SAMPLE_RATE", 0)
+        self.header = getattr(settings, "PROFILING_HEADER", "X-Profile")
+        self.directory = getattr(settings, "PROFILING_DIR", None)
+
+    def __call__(self, request):
+        if not self.wanted(request):
+            return self.get_response(request)
+        # profile the rest of the chain, so the view runs the normal way with
+        # ATOMIC_REQUESTS, process_exception and response rendering included
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            return self.profiled(request)
+        finally:
+            profiler.disable()
+            view_name = getattr(request, "_profile_view", "unresolved")
+            directory = os.path.join(self.directory, view_name)
+            os.makedirs(directory, exist_ok=True)
+            filename = "{}-{}-{}.collapsed".format(
+                request.method, time.strftime("%Y%m%d%H%M%S"), uuid.uuid4().hex[:8]
+            )
+            write_collapsed(collapse(profiler), os.path.join(directory, filename))
+
+    def profiled(self, request):
+        # a frame of its own to root the stacks at, collapse() starts from the
+        # functions without a recorded caller and the chain below recurses
+        return self.get_response(request)
+
+    def wanted(self, request):
+        if not self.directory:
+            return False
+        if self.header in request.headers:
+            user = getattr(request, "user", None)
+            if user is not None and user.is_staff:
+                return True
+        return self.sample_rate > 0 and random.randrange(self.sample_rate) == 0
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # only names the profile, the view itself runs as usual
+        view_class = getattr(view_func, "view_class", None) or getattr(
+            view_func, "cls", None
+        )
+        request._profile_view = (view_class or view_func).__name__
+        return None
@@ -1,4 +1,6 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 
 
@@ -16,6 +18,8 @@ class MenuItem(models.Model):
     price = models.DecimalField(max_digits=6, decimal_places=2, db_index=True)
     featured = models.BooleanField(db_index=True)
     category = models.ForeignKey(Category, on_delete=models.PROTECT)
+    # units left to sell, NULL means the item isn't stock tracked
+    inventory = models.PositiveIntegerField(null=True, blank=True)
 
     def __str__(self) -> str:
         return "".join(self.title)
@@ -52,6 +56,36 @@ class OrderItem(models.Model):
     class Meta:
         unique_together = ("order", "menuitem")
 
+
+# delivered orders moved out of Order/OrderItem by the archive_orders command,
+# they keep the id they had in the hot tables
+class ArchivedOrder(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="archived_orders"
+    )
+    delivery_crew = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        related_name="archived_deliveries",
+        null=True,
+    )
+    status = models.BooleanField(default=1)
+    total = models.DecimalField(max_digits=6, decimal_places=2)
+    date = models.DateField(db_index=True)
+
+
+class ArchivedOrderItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(
+        ArchivedOrder, on_delete=models.CASCADE, related_name="items"
+    )
+    menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
+    quantity = models.SmallIntegerField()
+    unit_price = models.DecimalField(max_digits=6, decimal_places=2)
+    price = models.DecimalField(max_digits=6, decimal_places=2)
+
+
 class Booking(models.Model):
     name = models.CharField(max_length=255)
     no_of_geusts = models.IntegerField()
@@ -68,3 +102,69 @@ class Menu(models.Model):
 
     def __str__(self):
         return f"{self.title} : {str(self.price)}"
+
+
+class Task(models.Model):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "pending"),
+        (RUNNING, "running"),
+        (DONE, "done"),
+        (FAILED, "failed"),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    # enqueueing twice with the same key keeps the first task only
+    idempotency_key = models.CharField(max_length=255, unique=True, null=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    # when a pending task is due, or when a running task's lease runs out
+    run_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "run_after"])]
+
+    def __str__(self):
+        return f"{self.name} : {self.status}"
+
+
+class IdempotencyKey(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    key = models.CharField(max_length=64)
+    endpoint = models.CharField(max_length=100)
+    # sha256 of the request the key was first used for
+    request_hash = models.CharField(max_length=64)
+    # the stored response, replayed when the client retries with the same key
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        unique_together = ("user", "key", "endpoint")
+
+
+class UserOrderStats(models.Model):
+    # kept up to date by restaurant.stats, rebuilt by reconcile_order_stats
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name="order_stats"
+    )
+    orders_placed = models.PositiveIntegerField(default=0)
+    lifetime_spend = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # first day of the month orders_this_month is counting
+    month = models.DateField(null=True)
+    orders_this_month = models.PositiveIntegerField(default=0)
+    open_deliveries = models.PositiveIntegerField(default=0)
+    deliveries_completed = models.PositiveIntegerField(default=0)
+
+
+class MenuVersion(models.Model):
+    # a single row bumped by every menu change, each worker compares it with
+    # the version of its cached menu tree (see restaurant.menu_tree)
+    version = models.PositiveBigIntegerField(default=0)
@@ -0,0 +1,40 @@
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Max, Min
+from django.db.models import OuterRef, Subquery
+from .models import Cart, MenuItem
+
+REPRICE_CHUNK_SIZE = 5000
+
+
+def reprice_carts(menuitem_ids=None, chunk_size=REPRICE_CHUNK_SIZE):
+    """
+    Refresh the unit_price/price snapshot of carts from the current
+    MenuItem.price.
+
+    Runs as UPDATE statements over primary key ranges of `chunk_size` rows,
+    each in its own transaction, so no cart is loaded into Python and locks
+    are held briefly. Returns the number of carts that changed.
+    """
+    carts = Cart.objects.all()
+    if menuitem_ids is not None:
+        carts = carts.filter(menuitem_id__in=menuitem_ids)
+    bounds = carts.aggregate(low=Min("pk"), high=Max("pk"))
+    if bounds["low"] is None:
+        return 0
+
+    current = Subquery(
+        MenuItem.objects.filter(pk=OuterRef("menuitem_id")).values("price")[:1]
+    )
+    price = ExpressionWrapper(
+        F("quantity") * current,
+        output_field=DecimalField(max_digits=6, decimal_places=2),
+    )
+    updated = 0
+    for start in range(bounds["low"], bounds["high"] + 1, chunk_size):
+        with transaction.atomic():
+            updated += (
+                carts.filter(pk__gte=start, pk__lt=start + chunk_size)
+                .exclude(unit_price=current)
+                .update(unit_price=current, price=price)
+            )
+    return updated
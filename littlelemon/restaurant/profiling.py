@@ -0,0 +1,69 @@
+import os
+import pstats
+import re
+from collections import Counter
+
+# stacks deeper than this, or worth less than a microsecond, are cut off
+MAX_DEPTH = 100
+MIN_MICROSECONDS = 1
+_address = re.compile(r" at 0x[0-9a-f]+")
+
+
+def frame_name(func):
+    filename, lineno, name = func
+    if filename == "~":
+        # built-in functions, pstats names them like "<built-in method ...>";
+        # drop object addresses so profiles from different processes add up
+        return _address.sub("", name).replace(";", ":")
+    short = os.sep.join(filename.split(os.sep)[-2:])
+    return f"{name} ({short}:{lineno})".replace(";", ":")
+
+
+def collapse(profile):
+    """
+    Turn a cProfile profile into collapsed stacks ("a;b;c microseconds").
+
+    cProfile records caller/callee pairs rather than whole stacks, so each
+    function's time is split between its callers in proportion to the time
+    spent under each call edge, the way flameprof and similar tools do it.
+    """
+    stats = pstats.Stats(profile).stats
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, (_, _, _, edge_ct) in callers.items():
+            callees.setdefault(caller, []).append((func, edge_ct))
+    roots = [func for func, row in stats.items() if not row[4]]
+
+    stacks = Counter()
+
+    def walk(func, share, path):
+        _, _, tt, ct, _ = stats[func]
+        ratio = share / ct if ct else 0
+        own = round(tt * ratio * 1e6)
+        if own >= MIN_MICROSECONDS:
+            stacks[";".join(frame_name(f) for f in path)] += own
+        if len(path) >= MAX_DEPTH:
+            return
+        for callee, edge_ct in callees.get(func, ()):
+            if callee not in path and edge_ct * ratio * 1e6 >= MIN_MICROSECONDS:
+                walk(callee, edge_ct * ratio, path + [callee])
+
+    for root in roots:
+        walk(root, stats[root][3], [root])
+    return stacks
+
+
+def read_collapsed(path):
+    stacks = Counter()
+    with open(path) as f:
+        for line in f:
+            stack, _, value = line.rstrip("\n").rpartition(" ")
+            if stack and value.isdigit():
+                stacks[stack] += int(value)
+    return stacks
+
+
+def write_collapsed(stacks, path):
+    with open(path, "w") as f:
+        for stack, value in sorted(stacks.items()):
+            f.write(f"{stack} {value}\n")
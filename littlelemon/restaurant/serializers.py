@@ -1,15 +1,64 @@
 from rest_framework import serializers
-from .models import Menu, Booking, MenuItem, Category, Cart, Order, OrderItem
+from .models import (
+    Menu,
+    Booking,
+    MenuItem,
+    Category,
+    Cart,
+    Order,
+    OrderItem,
+    UserOrderStats,
+)
+from .stats import month_start
 from django.contrib.auth.models import User, Group
 
 
+def _query_list(request, name):
+    if request is None:
+        return set()
+    return {x for x in request.query_params.get(name, "").split(",") if x}
+
+
+class SparseFieldsMixin:
+    """
+    ?fields=a,b keeps only the listed fields of the response. Related objects
+    named in `expandable` are rendered as their id unless ?expand= lists them.
+    """
+
+    expandable = set()
+
+    def _query_request(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        # the query parameters are about the top level objects only
+        return self.context.get("request") if parent is None else None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        expand = _query_list(self._query_request(), "expand")
+        for name in self.expandable:
+            if name not in expand:
+                fields[name] = serializers.PrimaryKeyRelatedField(read_only=True)
+        return fields
+
+    def to_representation(self, instance):
+        # trimmed on the way out only, input is still validated in full
+        data = super().to_representation(instance)
+        wanted = _query_list(self._query_request(), "fields")
+        if wanted:
+            for name in set(data) - wanted:
+                data.pop(name)
+        return data
+
+
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ["id", "slug", "title"]
 
 
-class MenuItemSerializer(serializers.ModelSerializer):
+class MenuItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     category = serializers.PrimaryKeyRelatedField(
         queryset=Category.objects.all(),
         allow_null=False,
@@ -19,7 +68,15 @@ class MenuItemSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = MenuItem
-        fields = ["id", "title", "price", "featured", "category", "category_title"]
+        fields = [
+            "id",
+            "title",
+            "price",
+            "featured",
+            "inventory",
+            "category",
+            "category_title",
+        ]
 
 
 class GroupSerializer(serializers.ModelSerializer):
@@ -37,9 +94,10 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ["id", "email", "username", "groups"]
 
 
-class CartSerializer(serializers.ModelSerializer):
-    menuitem = serializers.StringRelatedField(read_only=True)
+class CartSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    menuitem = MenuItemSerializer(read_only=True)
     menuitem_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, max_value=32767)
     user = serializers.SerializerMethodField(method_name="get_username", read_only=True)
     user_id = serializers.IntegerField(write_only=True)
 
@@ -56,11 +114,13 @@ class CartSerializer(serializers.ModelSerializer):
             "price",
         ]
 
+    expandable = {"menuitem"}
+
     def get_username(self, cart):
         return cart.user.username
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user_id = serializers.IntegerField()
 
     class Meta:
@@ -75,7 +135,7 @@ class OrderSerializer(serializers.ModelSerializer):
         ]
 
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     order_id = serializers.IntegerField(write_only=True)
     menuitem_id = serializers.IntegerField(write_only=True)
     order = OrderSerializer()
@@ -93,6 +153,39 @@ class OrderItemSerializer(serializers.ModelSerializer):
             "price",
         ]
 
+    expandable = {"order", "menuitem"}
+
+
+class OrderStatusBatchSerializer(serializers.Serializer):
+    orders = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=500
+    )
+    status = serializers.BooleanField()
+
+    def validate_orders(self, value):
+        # keep the caller's order but report each id once
+        return list(dict.fromkeys(value))
+
+
+class UserOrderStatsSerializer(serializers.ModelSerializer):
+    orders_this_month = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UserOrderStats
+        fields = [
+            "orders_placed",
+            "orders_this_month",
+            "lifetime_spend",
+            "open_deliveries",
+            "deliveries_completed",
+        ]
+
+    def get_orders_this_month(self, stats):
+        # the counter restarts with the first order of a new month
+        if stats.month != month_start():
+            return 0
+        return stats.orders_this_month
+
 
 class MenuSerializer(serializers.ModelSerializer):
     class Meta:
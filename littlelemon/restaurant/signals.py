@@ -0,0 +1,33 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .models import Category, MenuItem
+from .menu_tree import bump_menu_version, refresh_menu_tree
+from .pricing import reprice_carts
+
+
+@receiver(pre_save, sender=MenuItem)
+def remember_price(sender, instance, **kwargs):
+    instance._old_price = None
+    if instance.pk:
+        instance._old_price = (
+            MenuItem.objects.filter(pk=instance.pk)
+            .values_list("price", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=MenuItem)
+def reprice_on_change(sender, instance, created, **kwargs):
+    if created or instance._old_price is None:
+        return
+    if instance._old_price != instance.price:
+        # carts only see the new price once it is committed
+        transaction.on_commit(lambda: reprice_carts([instance.pk]))
+
+
+@receiver([post_save, post_delete], sender=MenuItem)
+@receiver([post_save, post_delete], sender=Category)
+def refresh_menu_tree_on_change(sender, **kwargs):
+    bump_menu_version()
+    transaction.on_commit(refresh_menu_tree)
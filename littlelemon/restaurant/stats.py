@@ -0,0 +1,154 @@
+from collections import Counter, defaultdict
+from datetime import date
+from decimal import Decimal
+from django.db import connection
+from django.db.models import Case, Count, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models import DecimalField, IntegerField
+from .models import ArchivedOrder, Order, UserOrderStats
+
+
+def month_start(day=None):
+    return (day or date.today()).replace(day=1)
+
+
+def _ensure(user_ids):
+    UserOrderStats.objects.bulk_create(
+        [UserOrderStats(user_id=pk) for pk in user_ids], ignore_conflicts=True
+    )
+
+
+def _minus(field, n, output_field=IntegerField()):
+    # never below zero: orders placed before the counters existed were never
+    # added, reconcile_order_stats backfills them
+    zero = Value(Decimal(0) if isinstance(output_field, DecimalField) else 0)
+    return Case(
+        When(**{f"{field}__gte": n}, then=F(field) - n),
+        default=zero,
+        output_field=output_field,
+    )
+
+
+def record_checkout(order):
+    """Count a new order for its customer, in the checkout transaction."""
+    _ensure([order.user_id])
+    this_month = month_start(order.date)
+    UserOrderStats.objects.filter(user_id=order.user_id).update(
+        orders_placed=F("orders_placed") + 1,
+        lifetime_spend=F("lifetime_spend") + order.total,
+        orders_this_month=Case(
+            When(month=this_month, then=F("orders_this_month") + 1),
+            default=Value(1),
+            output_field=IntegerField(),
+        ),
+        month=this_month,
+    )
+
+
+def record_order_deleted(order):
+    """Take a deleted order back out of its customer's totals."""
+    money = DecimalField(max_digits=12, decimal_places=2)
+    UserOrderStats.objects.filter(user_id=order.user_id).update(
+        orders_placed=_minus("orders_placed", 1),
+        lifetime_spend=_minus("lifetime_spend", order.total, output_field=money),
+        orders_this_month=Case(
+            When(
+                month=month_start(order.date),
+                then=_minus("orders_this_month", 1),
+            ),
+            default=F("orders_this_month"),
+            output_field=IntegerField(),
+        ),
+    )
+    record_delivery_changes([(order.delivery_crew_id, order.status, None, False)])
+
+
+def record_delivery_changes(changes):
+    """
+    Apply (old_crew, old_status, new_crew, new_status) order changes to the
+    delivery crew counters, with one UPDATE per crew member involved.
+    """
+    deltas = defaultdict(Counter)
+    for old_crew, old_status, new_crew, new_status in changes:
+        if (old_crew, bool(old_status)) == (new_crew, bool(new_status)):
+            continue
+        if old_crew is not None:
+            field = "deliveries_completed" if old_status else "open_deliveries"
+            deltas[old_crew][field] -= 1
+        if new_crew is not None:
+            field = "deliveries_completed" if new_status else "open_deliveries"
+            deltas[new_crew][field] += 1
+    _ensure(deltas)
+    for crew, delta in deltas.items():
+        UserOrderStats.objects.filter(user_id=crew).update(
+            **{
+                field: F(field) + n if n > 0 else _minus(field, -n)
+                for field, n in delta.items()
+                if n
+            }
+        )
+
+
+def _per_user(model, key, value, **filters):
+    return Subquery(
+        model.objects.filter(**{key: OuterRef("user")}, **filters)
+        .order_by()
+        .values(key)
+        .annotate(n=value)
+        .values("n")
+    )
+
+
+def _ensure_all():
+    # INSERT ... SELECT a row for every customer and crew member that has
+    # none yet, the ids stay in the database however many users there are
+    ids = (
+        Order.objects.order_by()
+        .values(member=F("user"))
+        .union(
+            ArchivedOrder.objects.order_by().values(member=F("user")),
+            Order.objects.exclude(delivery_crew=None)
+            .order_by()
+            .values(member=F("delivery_crew")),
+            ArchivedOrder.objects.exclude(delivery_crew=None)
+            .order_by()
+            .values(member=F("delivery_crew")),
+        )
+    )
+    sql, params = ids.query.sql_with_params()
+    table = connection.ops.quote_name(UserOrderStats._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (user_id, orders_placed, lifetime_spend,"
+            " orders_this_month, open_deliveries, deliveries_completed)"
+            f" SELECT ids.member, 0, 0, 0, 0, 0 FROM ({sql}) ids"
+            f" WHERE ids.member NOT IN (SELECT user_id FROM {table})",
+            params,
+        )
+
+
+def reconcile_stats():
+    """Recompute every counter from the order and archive tables."""
+    _ensure_all()
+
+    this_month = month_start()
+    money = DecimalField(max_digits=12, decimal_places=2)
+
+    def total(value, key="user", output_field=IntegerField(), **filters):
+        zero = Value(Decimal(0) if isinstance(output_field, DecimalField) else 0)
+        return Coalesce(
+            _per_user(Order, key, value, **filters), zero, output_field=output_field
+        ) + Coalesce(
+            _per_user(ArchivedOrder, key, value, **filters),
+            zero,
+            output_field=output_field,
+        )
+
+    return UserOrderStats.objects.update(
+        orders_placed=total(Count("pk")),
+        lifetime_spend=total(Sum("total"), output_field=money),
+        month=this_month,
+        orders_this_month=total(Count("pk"), date__gte=this_month),
+        open_deliveries=total(Count("pk"), key="delivery_crew", status=False),
+        deliveries_completed=total(Count("pk"), key="delivery_crew", status=True),
+    )
@@ -0,0 +1,141 @@
+import logging
+from datetime import timedelta
+from django.core.mail import send_mail
+from django.db import close_old_connections, connection
+from django.db.models import F
+from django.utils import timezone
+from .models import Order, Task
+
+logger = logging.getLogger(__name__)
+
+TASK_LEASE = timedelta(minutes=5)
+_handlers = {}
+
+
+def task(name):
+    """Register a function as the handler for tasks called `name`."""
+
+    def register(func):
+        _handlers[name] = func
+        return func
+
+    return register
+
+
+def enqueue(name, payload=None, key=None, max_attempts=5):
+    """
+    Queue a task. Call it inside the transaction that makes the task
+    necessary, so the task exists exactly when that work was committed.
+    """
+    if name not in _handlers:
+        raise ValueError(f"unknown task {name!r}")
+    fields = {"name": name, "payload": payload or {}, "max_attempts": max_attempts}
+    if key is None:
+        return Task.objects.create(**fields)
+    return Task.objects.get_or_create(idempotency_key=key, defaults=fields)[0]
+
+
+def enqueue_status_changes(changes):
+    """
+    Queue notify_order_status for (order_id, old_status, new_status) changes
+    in one insert. Call it with the orders locked, after checking each status
+    really changed: that is what keeps a change from being queued twice.
+    """
+    Task.objects.bulk_create(
+        [
+            Task(name="notify_order_status", payload={"order": pk, "status": bool(new)})
+            for pk, old, new in changes
+            if bool(old) != bool(new)
+        ]
+    )
+
+
+def claim(limit):
+    """
+    Lease up to `limit` due tasks to this worker. Returns (id, attempts)
+    pairs, pass each one to run().
+    """
+    now = timezone.now()
+    # a lease that ran out on the last attempt means the task took its
+    # worker down with it, don't hand it to another one
+    Task.objects.filter(
+        status=Task.RUNNING, run_after__lte=now, attempts__gte=F("max_attempts")
+    ).update(status=Task.FAILED, last_error="lease expired on the last attempt")
+    due = Task.objects.filter(
+        status__in=[Task.PENDING, Task.RUNNING],
+        run_after__lte=now,
+        attempts__lt=F("max_attempts"),
+    )
+    claimed = []
+    for pk, attempts in due.order_by("run_after").values_list("pk", "attempts")[:limit]:
+        # conditional update, another worker may have taken it in between
+        taken = due.filter(pk=pk, attempts=attempts).update(
+            status=Task.RUNNING, attempts=attempts + 1, run_after=now + TASK_LEASE
+        )
+        if taken:
+            claimed.append((pk, attempts + 1))
+    return claimed
+
+
+def run(pk, attempts):
+    """
+    Run one claimed task, then mark it done or schedule the retry.
+
+    The outcome is only written while the task still carries the attempts
+    count of this claim; if the lease ran out and another worker claimed it
+    again, that worker owns the task now.
+    """
+    close_old_connections()
+    try:
+        claimed = Task.objects.filter(pk=pk, status=Task.RUNNING, attempts=attempts)
+        try:
+            task = claimed.get()
+        except Task.DoesNotExist:
+            logger.warning("task %s is gone or was claimed again", pk)
+            return False
+        try:
+            _handlers[task.name](**task.payload)
+        except Exception as exc:
+            logger.exception("task %s (%s) failed", task.pk, task.name)
+            if attempts >= task.max_attempts:
+                status, run_after = Task.FAILED, task.run_after
+            else:
+                # 30s, 60s, 120s, ...
+                backoff = timedelta(seconds=30 * 2 ** (attempts - 1))
+                status, run_after = Task.PENDING, timezone.now() + backoff
+            claimed.update(status=status, run_after=run_after, last_error=repr(exc))
+            return False
+        return bool(claimed.update(status=Task.DONE, last_error=""))
+    finally:
+        connection.close()
+
+
+@task("send_order_receipt")
+def send_order_receipt(order):
+    order = Order.objects.select_related("user").get(pk=order)
+    if not order.user.email:
+        return
+    lines = [
+        f"{item.quantity} x {item.menuitem} : {item.price}"
+        for item in order.orderitem_set.select_related("menuitem")
+    ]
+    send_mail(
+        f"Little Lemon order #{order.pk}",
+        "\n".join(lines + [f"total : {order.total}"]),
+        None,
+        [order.user.email],
+    )
+
+
+@task("notify_order_status")
+def notify_order_status(order, status):
+    order = Order.objects.select_related("user").filter(pk=order).first()
+    if order is None or not order.user.email:
+        return
+    state = "delivered" if status else "being prepared"
+    send_mail(
+        f"Little Lemon order #{order.pk}",
+        f"Your order is {state}.",
+        None,
+        [order.user.email],
+    )
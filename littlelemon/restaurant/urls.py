@@ -8,6 +8,7 @@ urlpatterns = [
     path("menu/<int:pk>", views.SingleMenuItemView.as_view(), name="api-menu-item"),
     path("api-token-auth/", obtain_auth_token, name="api-get-token"),
     path("menu-items", views.MenuItemView.as_view()),
+    path("menu-items/tree", views.MenuTreeView.as_view(), name="menu-tree"),
     path("menu-items/<int:pk>", views.SingleMenuItemView.as_view()),
     path("groups/manager/users", views.ManagerView.as_view()),
     path("groups/manager/users/<int:pk>", views.RemoveManagerView),
@@ -24,4 +25,6 @@ urlpatterns = [
     path("cart/menu-items", views.CartView.as_view()),
     path("orders", views.OrderView.as_view()),
     path("orders/<int:pk>", views.SingleOrderView.as_view()),
+    path("orders/status", views.OrderStatusBatchView.as_view()),
+    path("orders/stats", views.OrderStatsView.as_view()),
 ]
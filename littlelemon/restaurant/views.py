@@ -5,13 +5,24 @@ from django.contrib.auth.models import User, Group
 from rest_framework.views import APIView
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
-from .models import MenuItem, Cart, Order, OrderItem, Menu, Booking
+from .models import (
+    MenuItem,
+    Cart,
+    Order,
+    OrderItem,
+    ArchivedOrderItem,
+    UserOrderStats,
+    Menu,
+    Booking,
+)
 from .serializers import (
     MenuItemSerializer,
     UserSerializer,
     CartSerializer,
     OrderSerializer,
     OrderItemSerializer,
+    OrderStatusBatchSerializer,
+    UserOrderStatsSerializer,
     MenuSerializer,
     BookingSerializer,
 )
@@ -24,6 +35,15 @@ from itertools import groupby
 from decimal import Decimal
 from django.core.exceptions import ObjectDoesNotExist
 from datetime import date
+from django.db import transaction
+from django.db.models import Value
+from .inventory import reserve_stock, release_stock
+from .tasks import enqueue, enqueue_status_changes
+from .idempotency import idempotent
+from .menu_tree import get_menu_tree
+from .encoding import accepts_encoding
+from .stats import record_checkout, record_delivery_changes, record_order_deleted
+from django.http import HttpResponse, HttpResponseNotModified
 
 
 # Create your views here.
@@ -55,8 +75,27 @@ class SingleMenuItemView(
         return [IsAdminUser()]
 
 
+class MenuTreeView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        # the whole catalogue grouped by category, encoded once per menu change
+        etag, body, gzipped = get_menu_tree()
+        if request.headers.get("If-None-Match") == etag:
+            return HttpResponseNotModified(headers={"ETag": etag})
+        if accepts_encoding(request.headers.get("Accept-Encoding", ""), "gzip"):
+            response = HttpResponse(gzipped, content_type="application/json")
+            response["Content-Encoding"] = "gzip"
+        else:
+            response = HttpResponse(body, content_type="application/json")
+        response["ETag"] = etag
+        response["Vary"] = "Accept-Encoding"
+        return response
+
+
 class ManagerView(generics.ListCreateAPIView):
-    queryset = User.objects.filter(groups=Group.objects.get(name="Manager"))
+    # filter by name so importing this module doesn't hit the database
+    queryset = User.objects.filter(groups__name="Manager")
     permission_classes = [IsAdminUser]
     serializer_class = UserSerializer
 
@@ -129,10 +168,13 @@ class CartView(APIView):
     def get(self, request):
         user = request.user
         if user:
-            queryset = Cart.objects.select_related("user").filter(user=user)
-        serializer = CartSerializer(queryset, many=True)
+            queryset = Cart.objects.select_related("user", "menuitem__category").filter(
+                user=user
+            )
+        serializer = CartSerializer(queryset, many=True, context={"request": request})
         return Response(serializer.data, status.HTTP_200_OK)
 
+    @idempotent
     def post(self, request):
         menuitem = request.data["menuitem"]
         quantity = request.data["quantity"]
@@ -158,7 +200,7 @@ class CartView(APIView):
             return Response({"message": message}, status=status.HTTP_201_CREATED)
         else:
             message = serializer.error_messages
-            Response({"message": message}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({"message": message}, status=status.HTTP_400_BAD_REQUEST)
 
     def delete(self, request):
         user = request.user
@@ -175,29 +217,88 @@ class OrderView(APIView):
     filterset_fields = ["status", "date"]
     pagination_class = PageNumberPagination
 
+    # columns shared by OrderItem and ArchivedOrderItem, the UNION selects these
+    history_columns = [
+        "id",
+        "order_id",
+        "menuitem_id",
+        "quantity",
+        "unit_price",
+        "price",
+    ]
+
+    def include_archived(self, request):
+        # ?archived=true adds orders moved out by the archive_orders command
+        return request.query_params.get("archived", "").lower() in ("1", "true")
+
+    def paginate_history(self, request, order_items, archived_items, ordering=None):
+        """
+        Paginate order items, adding archived ones when they are asked for.
+
+        With the archive the two tables are merged by a UNION ALL, so the
+        database sorts and slices and only the items on the page are loaded.
+        """
+        paginator = self.pagination_class()
+        ordering = ordering or ["order_id", "id"]
+        if not self.include_archived(request):
+            order_items = order_items.select_related("order", "menuitem__category")
+            return paginator, paginator.paginate_queryset(
+                order_items.order_by(*ordering), request
+            )
+        # a UNION can only be sorted by the columns it selects
+        ordering = [
+            field for field in ordering if field.lstrip("-") in self.history_columns
+        ] or ["order_id", "id"]
+        merged = (
+            order_items.order_by()
+            .values(*self.history_columns, archived=Value(False))
+            .union(
+                archived_items.order_by().values(
+                    *self.history_columns, archived=Value(True)
+                ),
+                all=True,
+            )
+            .order_by(*ordering)
+        )
+        page = paginator.paginate_queryset(merged, request)
+        live = OrderItem.objects.select_related("order", "menuitem__category").in_bulk(
+            [row["id"] for row in page if not row["archived"]]
+        )
+        archived = ArchivedOrderItem.objects.select_related(
+            "order", "menuitem__category"
+        ).in_bulk([row["id"] for row in page if row["archived"]])
+        return paginator, [
+            (archived if row["archived"] else live)[row["id"]] for row in page
+        ]
+
     def get(self, request):
         user = request.user
         if user.groups.filter(name="Manager").exists():
             # Query to retrieve OrderItems along with the aggregated data
-            order_items = OrderItem.objects.select_related("order").all()
+            order_items = OrderItem.objects.all()
+            archived_items = ArchivedOrderItem.objects.all()
 
             to_price = request.query_params.get("to_price")
             search = request.query_params.get("search")
             ordering = request.query_params.get("ordering")
 
+            # the same filters go on both halves of the history
             if to_price:
-                order_items = order_items.filter(total__lte=to_price)
+                order_items = order_items.filter(order__total__lte=to_price)
+                archived_items = archived_items.filter(order__total__lte=to_price)
             if search:
-                order_items = order_items.filter(status__icontains=search)
-            if ordering:
-                ordering_fields = ordering.split(",")
-                order_items = order_items.order_by(*ordering_fields)
-            paginator = (
-                self.pagination_class()
-            )  # Create an instance of the pagination class
-            paginated_order_items = paginator.paginate_queryset(order_items, request)
-            serializer = OrderItemSerializer(paginated_order_items, many=True)
-            grouped_order_items = groupby(serializer.data, key=lambda x: x.pop("order"))
+                order_items = order_items.filter(order__status__icontains=search)
+                archived_items = archived_items.filter(order__status__icontains=search)
+            ordering_fields = ordering.split(",") if ordering else None
+            paginator, paginated_order_items = self.paginate_history(
+                request, order_items, archived_items, ordering_fields
+            )
+            serializer = OrderItemSerializer(
+                paginated_order_items, many=True, context={"request": request}
+            )
+            grouped_order_items = groupby(
+                serializer.data, key=lambda x: x.pop("order", None)
+            )
 
             # Create a list of dictionaries containing the grouped order_items
             grouped_orders_list = []
@@ -212,73 +313,107 @@ class OrderView(APIView):
         elif user.groups.filter(name="Delivery Crew").exists():
             delivery_orders = Order.objects.filter(delivery_crew=user.pk)
             order_items = OrderItem.objects.filter(order__in=delivery_orders)
-            serializer = OrderItemSerializer(order_items, many=True)
-            paginated_data = self.pagination_class().paginate_queryset(
-                serializer.data, request
+            paginator, paginated_order_items = self.paginate_history(
+                request,
+                order_items,
+                ArchivedOrderItem.objects.filter(order__delivery_crew=user.pk),
+            )
+            serializer = OrderItemSerializer(
+                paginated_order_items, many=True, context={"request": request}
             )
-            return self.pagination_class().get_paginated_response(paginated_data)
+            return paginator.get_paginated_response(serializer.data)
         else:
             user_orders = Order.objects.filter(user=user.pk)
             order_items = OrderItem.objects.filter(order__in=user_orders)
+            paginator, paginated_order_items = self.paginate_history(
+                request,
+                order_items,
+                ArchivedOrderItem.objects.filter(order__user=user.pk),
+            )
 
-            orderitem_ser = OrderItemSerializer(order_items, many=True)
-            paginator = (
-                self.pagination_class()
-            )  # Create an instance of the pagination class
-            paginated_order_items = paginator.paginate_queryset(
-                orderitem_ser.data, request
+            orderitem_ser = OrderItemSerializer(
+                paginated_order_items, many=True, context={"request": request}
             )
 
             # Return the paginated response
-            return paginator.get_paginated_response(paginated_order_items)
+            return paginator.get_paginated_response(orderitem_ser.data)
 
+    @idempotent
     def post(self, request):
-        cartview_endpoint = CartView().get(request=request)
-        total = 0
-        for item in cartview_endpoint.data:
-            total += Decimal(item["price"])
-
-        order_data = {
-            "user_id": request.user.id,
-            "delivery_crew": None,
-            "total": total,
-            "date": date.today(),
-        }
-        serializer = OrderSerializer(data=order_data)
-        if serializer.is_valid():
-            serializer.save()
-            order_id = serializer.data.get("id")
-            order_items = [{**x, "order_id": order_id} for x in cartview_endpoint.data]
-            item_serializer = OrderItemSerializer(data=order_items, many=True)
-            if item_serializer.is_valid():
-                item_serializer.save()
-                del_response = CartView().delete(request=request)
-                if del_response.status_code == 200:
-                    return Response(
-                        {"message:": "items added to a new order"},
-                        status=status.HTTP_201_CREATED,
-                    )
-                else:
-                    return Response(
-                        {"message": "error while deleting"},
-                        status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    )
-            else:
-                return Response(item_serializer.errors)
-        else:
-            return Response(
-                serializer.errors, status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        with transaction.atomic():
+            cart_items = list(
+                Cart.objects.select_for_update().filter(user=request.user)
+            )
+            if not cart_items:
+                return Response(
+                    {"message": "your cart is empty"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            # lines that are out of stock stay in the cart, the rest is ordered
+            short = reserve_stock({x.menuitem_id: x.quantity for x in cart_items})
+            reserved = [x for x in cart_items if x.menuitem_id not in short]
+            if not reserved:
+                return Response(
+                    {"message": "items are out of stock", "rejected": sorted(short)},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            order = Order.objects.create(
+                user=request.user,
+                delivery_crew=None,
+                total=sum(x.price for x in reserved),
+                date=date.today(),
+            )
+            OrderItem.objects.bulk_create(
+                OrderItem(
+                    order=order,
+                    menuitem_id=x.menuitem_id,
+                    quantity=x.quantity,
+                    unit_price=x.unit_price,
+                    price=x.price,
+                )
+                for x in reserved
+            )
+            Cart.objects.filter(pk__in=[x.pk for x in reserved]).delete()
+            record_checkout(order)
+            enqueue(
+                "send_order_receipt", {"order": order.pk}, key=f"receipt:{order.pk}"
             )
+        return Response(
+            {
+                "message": "items added to a new order",
+                "order": order.pk,
+                "rejected": sorted(short),
+            },
+            status=status.HTTP_201_CREATED,
+        )
 
 
 class SingleOrderView(APIView):
     permission_classes = [IsAuthenticated]
 
+    def save_order(self, serialized_item):
+        # counters and side effects of a status change go in with the change
+        serialized_item.is_valid(raise_exception=True)
+        with transaction.atomic():
+            old_crew, old_status = (
+                Order.objects.select_for_update()
+                .filter(pk=serialized_item.instance.pk)
+                .values_list("delivery_crew", "status")
+                .get()
+            )
+            order = serialized_item.save()
+            record_delivery_changes(
+                [(old_crew, old_status, order.delivery_crew_id, order.status)]
+            )
+            if order.status != old_status:
+                enqueue_status_changes([(order.pk, old_status, order.status)])
+        return Response(serialized_item.data, status.HTTP_205_RESET_CONTENT)
+
     def get(self, request, pk):
         order = get_object_or_404(Order, pk=pk)
         print(order.user)
         if order.user == request.user:
-            serializer = OrderSerializer(order)
+            serializer = OrderSerializer(order, context={"request": request})
             return Response(serializer.data)
         else:
             return Response(
@@ -288,8 +423,20 @@ class SingleOrderView(APIView):
     def delete(self, request, pk):
         user = request.user
         if user.groups.filter(name="Manager").exists():
-            queryset = get_object_or_404(Order, pk=pk)
-            queryset.delete()
+            with transaction.atomic():
+                queryset = get_object_or_404(Order.objects.select_for_update(), pk=pk)
+                # give the reserved stock back before the items are gone,
+                # unless the order was delivered and the food is served
+                if not queryset.status:
+                    release_stock(
+                        dict(
+                            queryset.orderitem_set.values_list(
+                                "menuitem_id", "quantity"
+                            )
+                        )
+                    )
+                record_order_deleted(queryset)
+                queryset.delete()
         return Response(
             {"message": "your cart is empty now!"}, status=status.HTTP_200_OK
         )
@@ -301,9 +448,7 @@ class SingleOrderView(APIView):
                 {"message": "You are not authorized."}, status.HTTP_403_FORBIDDEN
             )
         serialized_item = OrderSerializer(order, data=request.data)
-        serialized_item.is_valid(raise_exception=True)
-        serialized_item.save()
-        return Response(serialized_item.data, status.HTTP_205_RESET_CONTENT)
+        return self.save_order(serialized_item)
 
     def patch(self, request, pk):
         order = get_object_or_404(Order, pk=pk)
@@ -317,20 +462,82 @@ class SingleOrderView(APIView):
             deliverystatus = request.data["status"]
             status_data = {"status": deliverystatus}
             serialized_item = OrderSerializer(order, data=status_data, partial=True)
-            serialized_item.is_valid(raise_exception=True)
-            serialized_item.save()
-            return Response(serialized_item.data, status.HTTP_205_RESET_CONTENT)
+            return self.save_order(serialized_item)
         if request.user.groups.filter(name="Manager").exists():
             serialized_item = OrderSerializer(order, data=request.data, partial=True)
-            serialized_item.is_valid(raise_exception=True)
-            serialized_item.save()
-            return Response(serialized_item.data, status.HTTP_205_RESET_CONTENT)
+            return self.save_order(serialized_item)
 
         return Response(
             {"message": "You are not authorized."}, status.HTTP_403_FORBIDDEN
         )
 
 
+class OrderStatsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        stats = UserOrderStats.objects.filter(user=request.user).first()
+        serializer = UserOrderStatsSerializer(stats or UserOrderStats())
+        return Response(serializer.data, status.HTTP_200_OK)
+
+
+class OrderStatusBatchView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = OrderStatusBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        order_ids = serializer.validated_data["orders"]
+        new_status = serializer.validated_data["status"]
+
+        roles = set(
+            request.user.groups.filter(
+                name__in=["Manager", "Delivery Crew"]
+            ).values_list("name", flat=True)
+        )
+        if not roles:
+            return Response(
+                {"message": "You are not authorized."}, status.HTTP_403_FORBIDDEN
+            )
+        with transaction.atomic():
+            # one query tells apart missing orders and orders of another crew member
+            found = {
+                pk: (crew, current)
+                for pk, crew, current in Order.objects.select_for_update()
+                .filter(pk__in=order_ids)
+                .values_list("pk", "delivery_crew", "status")
+            }
+            if "Manager" in roles:
+                allowed = set(found)
+            else:
+                allowed = {
+                    pk for pk, (crew, _) in found.items() if crew == request.user.pk
+                }
+            changed = [pk for pk in allowed if found[pk][1] != new_status]
+            if changed:
+                orders = Order.objects.filter(pk__in=changed)
+                if "Manager" not in roles:
+                    # never touch an order this driver doesn't hold any more
+                    orders = orders.filter(delivery_crew=request.user)
+                orders.update(status=new_status)
+                record_delivery_changes(
+                    (found[pk][0], found[pk][1], found[pk][0], new_status)
+                    for pk in changed
+                )
+                enqueue_status_changes((pk, found[pk][1], new_status) for pk in changed)
+
+        results = []
+        for pk in order_ids:
+            if pk in allowed:
+                result = "updated"
+            elif pk in found:
+                result = "not authorized"
+            else:
+                result = "not found"
+            results.append({"id": pk, "result": result})
+        return Response({"results": results}, status.HTTP_200_OK)
+
+
 def index(request):
     return render(request, "index.html", {})
 
@@ -0,0 +1,106 @@
+import threading
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from rest_framework import status
+from restaurant.models import Category, MenuItem, Cart, Order, IdempotencyKey
+from tests.utils import no_throttling
+
+
+class IdempotencyMixin:
+    def setUp(self):
+        self.user = User.objects.create_user(username="customer")
+        self.item = MenuItem.objects.create(
+            title="Pasta",
+            price=10,
+            featured=False,
+            category=Category.objects.create(slug="mains", title="Mains"),
+        )
+        Cart.objects.create(
+            user=self.user, menuitem=self.item, quantity=1, unit_price=10, price=10
+        )
+
+    def checkout(self, key):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        return client.post("/restaurant/orders", HTTP_IDEMPOTENCY_KEY=key)
+
+
+@no_throttling
+class IdempotencyKeyTest(IdempotencyMixin, TestCase):
+    def test_retry_replays_checkout(self):
+        first = self.checkout("abc")
+        second = self.checkout("abc")
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.data["order"], first.data["order"])
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_new_key_runs_again(self):
+        self.checkout("abc")
+        response = self.checkout("def")
+        # the cart was emptied by the first checkout
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(IdempotencyKey.objects.count(), 2)
+
+    def test_cart_add_replays(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        Cart.objects.all().delete()
+        for _ in range(2):
+            response = client.post(
+                "/restaurant/cart/menu-items",
+                {"menuitem": self.item.pk, "quantity": 2},
+                HTTP_IDEMPOTENCY_KEY="add-1",
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Cart.objects.count(), 1)
+
+    def test_key_reused_for_other_body_is_rejected(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        Cart.objects.all().delete()
+        other = MenuItem.objects.create(
+            title="Soup", price=5, featured=False, category=self.item.category
+        )
+        for menuitem, expected in (
+            (self.item, status.HTTP_201_CREATED),
+            (other, status.HTTP_422_UNPROCESSABLE_ENTITY),
+        ):
+            response = client.post(
+                "/restaurant/cart/menu-items",
+                {"menuitem": menuitem.pk, "quantity": 2},
+                HTTP_IDEMPOTENCY_KEY="add-1",
+            )
+            self.assertEqual(response.status_code, expected)
+        self.assertEqual(
+            list(Cart.objects.values_list("menuitem", flat=True)), [self.item.pk]
+        )
+
+
+@no_throttling
+class ConcurrentIdempotencyKeyTest(IdempotencyMixin, TransactionTestCase):
+    def test_concurrent_duplicates_run_once(self):
+        responses = []
+        barrier = threading.Barrier(4)
+
+        def checkout():
+            try:
+                barrier.wait()
+                responses.append(self.checkout("same"))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(
+            [response.status_code for response in responses],
+            [status.HTTP_201_CREATED] * 4,
+        )
@@ -0,0 +1,150 @@
+import threading
+from django.test import TestCase, TransactionTestCase
+from django.db import connection, transaction
+from django.contrib.auth.models import User, Group
+from rest_framework.test import APIClient
+from rest_framework import status
+from restaurant.models import Category, MenuItem, Cart, Order, OrderItem
+from restaurant.inventory import reserve_stock, release_stock
+from tests.utils import no_throttling
+
+
+class ReserveStockTest(TestCase):
+    def setUp(self):
+        category = Category.objects.create(slug="mains", title="Mains")
+        self.pasta = MenuItem.objects.create(
+            title="Pasta", price=10, featured=False, category=category, inventory=3
+        )
+        self.salad = MenuItem.objects.create(
+            title="Salad", price=5, featured=False, category=category, inventory=1
+        )
+        self.bread = MenuItem.objects.create(
+            title="Bread", price=2, featured=False, category=category
+        )
+
+    def test_reserve_all(self):
+        short = reserve_stock({self.pasta.pk: 2, self.salad.pk: 1, self.bread.pk: 9})
+        self.assertEqual(short, set())
+        self.pasta.refresh_from_db()
+        self.salad.refresh_from_db()
+        self.bread.refresh_from_db()
+        self.assertEqual(self.pasta.inventory, 1)
+        self.assertEqual(self.salad.inventory, 0)
+        self.assertIsNone(self.bread.inventory)
+
+    def test_reserve_rejects_short_lines_only(self):
+        short = reserve_stock({self.pasta.pk: 2, self.salad.pk: 2})
+        self.assertEqual(short, {self.salad.pk})
+        self.pasta.refresh_from_db()
+        self.salad.refresh_from_db()
+        self.assertEqual(self.pasta.inventory, 1)
+        self.assertEqual(self.salad.inventory, 1)
+
+    def test_reserve_rejects_non_positive_quantities(self):
+        short = reserve_stock({self.pasta.pk: -50, self.salad.pk: 0, self.bread.pk: 1})
+        self.assertEqual(short, {self.pasta.pk, self.salad.pk})
+        self.pasta.refresh_from_db()
+        self.salad.refresh_from_db()
+        self.assertEqual(self.pasta.inventory, 3)
+        self.assertEqual(self.salad.inventory, 1)
+
+    def test_release(self):
+        release_stock({self.pasta.pk: 2, self.bread.pk: 1})
+        self.pasta.refresh_from_db()
+        self.bread.refresh_from_db()
+        self.assertEqual(self.pasta.inventory, 5)
+        self.assertIsNone(self.bread.inventory)
+
+
+@no_throttling
+class CheckoutStockTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="customer", password="pass")
+        self.manager = User.objects.create_user(username="manager", password="pass")
+        Group.objects.create(name="Manager").user_set.add(self.manager)
+        category = Category.objects.create(slug="mains", title="Mains")
+        self.pasta = MenuItem.objects.create(
+            title="Pasta", price=10, featured=False, category=category, inventory=5
+        )
+        self.salad = MenuItem.objects.create(
+            title="Salad", price=5, featured=False, category=category, inventory=0
+        )
+        for item, quantity in ((self.pasta, 2), (self.salad, 1)):
+            Cart.objects.create(
+                user=self.user,
+                menuitem=item,
+                quantity=quantity,
+                unit_price=item.price,
+                price=item.price * quantity,
+            )
+
+    def test_checkout_keeps_short_lines_in_cart(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post("/restaurant/orders")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["rejected"], [self.salad.pk])
+        order = Order.objects.get(pk=response.data["order"])
+        self.assertEqual(order.total, 20)
+        self.assertEqual(
+            list(Cart.objects.values_list("menuitem", flat=True)), [self.salad.pk]
+        )
+        self.pasta.refresh_from_db()
+        self.assertEqual(self.pasta.inventory, 3)
+
+    def test_cart_rejects_negative_quantity(self):
+        self.client.force_authenticate(user=self.user)
+        Cart.objects.all().delete()
+        response = self.client.post(
+            "/restaurant/cart/menu-items", {"menuitem": self.pasta.pk, "quantity": -50}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_delete_delivered_order_keeps_stock(self):
+        self.client.force_authenticate(user=self.user)
+        order_id = self.client.post("/restaurant/orders").data["order"]
+        Order.objects.filter(pk=order_id).update(status=True)
+        self.client.force_authenticate(user=self.manager)
+        self.client.delete(f"/restaurant/orders/{order_id}")
+        self.pasta.refresh_from_db()
+        self.assertEqual(self.pasta.inventory, 3)
+
+    def test_delete_order_releases_stock(self):
+        self.client.force_authenticate(user=self.user)
+        order_id = self.client.post("/restaurant/orders").data["order"]
+        self.client.force_authenticate(user=self.manager)
+        self.client.delete(f"/restaurant/orders/{order_id}")
+        self.assertFalse(OrderItem.objects.exists())
+        self.pasta.refresh_from_db()
+        self.assertEqual(self.pasta.inventory, 5)
+
+
+class ConcurrentReserveTest(TransactionTestCase):
+    def setUp(self):
+        category = Category.objects.create(slug="mains", title="Mains")
+        self.item = MenuItem.objects.create(
+            title="Pasta", price=10, featured=False, category=category, inventory=5
+        )
+
+    def test_no_oversell(self):
+        results = []
+        barrier = threading.Barrier(10)
+
+        def checkout():
+            try:
+                barrier.wait()
+                with transaction.atomic():
+                    results.append(reserve_stock({self.item.pk: 1}))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), 10)
+        self.assertEqual(sum(1 for short in results if not short), 5)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.inventory, 0)
@@ -0,0 +1,71 @@
+import gzip
+import json
+from django.test import TestCase
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from rest_framework import status
+from restaurant.models import Category, MenuItem
+from restaurant.menu_tree import bump_menu_version
+from tests.utils import no_throttling
+
+
+@no_throttling
+class MenuTreeTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username="user"))
+        mains = Category.objects.create(slug="mains", title="Mains")
+        desserts = Category.objects.create(slug="desserts", title="Desserts")
+        with self.captureOnCommitCallbacks(execute=True):
+            MenuItem.objects.create(
+                title="Pasta", price=10, featured=True, category=mains
+            )
+            MenuItem.objects.create(
+                title="Grill", price=15, featured=False, category=mains
+            )
+            self.cake = MenuItem.objects.create(
+                title="Lemon cake", price=5, featured=False, category=desserts
+            )
+
+    def test_tree_grouped_by_category(self):
+        response = self.client.get("/restaurant/menu-items/tree")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        tree = json.loads(response.content)
+        self.assertEqual([c["title"] for c in tree], ["Desserts", "Mains"])
+        self.assertEqual([i["title"] for i in tree[1]["items"]], ["Grill", "Pasta"])
+
+    def test_gzip_and_etag(self):
+        response = self.client.get(
+            "/restaurant/menu-items/tree", HTTP_ACCEPT_ENCODING="gzip"
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))), 2)
+        response = self.client.get(
+            "/restaurant/menu-items/tree", HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_rebuilt_on_menu_change(self):
+        self.cake.price = 6
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cake.save()
+        tree = json.loads(self.client.get("/restaurant/menu-items/tree").content)
+        self.assertEqual(tree[0]["items"][0]["price"], "6.00")
+
+    def test_gzip_refused_with_zero_q(self):
+        response = self.client.get(
+            "/restaurant/menu-items/tree", HTTP_ACCEPT_ENCODING="gzip;q=0, identity"
+        )
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(len(json.loads(response.content)), 2)
+
+    def test_rebuilt_when_another_worker_changes_the_menu(self):
+        self.client.get("/restaurant/menu-items/tree")
+        # what this worker sees when another one saves a menu item: the rows
+        # and the version change, but none of its own signals run
+        MenuItem.objects.filter(pk=self.cake.pk).update(price=7)
+        tree = json.loads(self.client.get("/restaurant/menu-items/tree").content)
+        self.assertEqual(tree[0]["items"][0]["price"], "5.00")
+        bump_menu_version()
+        tree = json.loads(self.client.get("/restaurant/menu-items/tree").content)
+        self.assertEqual(tree[0]["items"][0]["price"], "7.00")
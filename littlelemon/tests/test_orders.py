@@ -0,0 +1,155 @@
+from datetime import date, timedelta
+from io import StringIO
+from django.core.management import call_command, CommandError
+from django.test import TestCase
+from django.contrib.auth.models import User, Group
+from rest_framework.test import APIClient
+from rest_framework import status
+from restaurant.models import (
+    Category,
+    MenuItem,
+    Order,
+    OrderItem,
+    ArchivedOrder,
+    ArchivedOrderItem,
+)
+from tests.utils import no_throttling
+
+
+@no_throttling
+class OrderStatusBatchTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.customer = User.objects.create_user(username="customer")
+        self.driver = User.objects.create_user(username="driver")
+        self.other_driver = User.objects.create_user(username="other")
+        self.manager = User.objects.create_user(username="manager")
+        crew = Group.objects.create(name="Delivery Crew")
+        crew.user_set.add(self.driver, self.other_driver)
+        Group.objects.create(name="Manager").user_set.add(self.manager)
+        self.mine = [self.make_order(self.driver) for _ in range(3)]
+        self.theirs = self.make_order(self.other_driver)
+
+    def make_order(self, crew):
+        return Order.objects.create(
+            user=self.customer, delivery_crew=crew, total=10, date=date.today()
+        )
+
+    def test_driver_closes_own_route(self):
+        self.client.force_authenticate(user=self.driver)
+        ids = [order.pk for order in self.mine] + [self.theirs.pk, 9999]
+        response = self.client.post(
+            "/restaurant/orders/status", {"orders": ids, "status": True}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = {x["id"]: x["result"] for x in response.data["results"]}
+        self.assertEqual(
+            results,
+            {
+                **{order.pk: "updated" for order in self.mine},
+                self.theirs.pk: "not authorized",
+                9999: "not found",
+            },
+        )
+        self.assertEqual(Order.objects.filter(status=True).count(), 3)
+
+    def test_manager_updates_any_order(self):
+        self.client.force_authenticate(user=self.manager)
+        response = self.client.post(
+            "/restaurant/orders/status",
+            {"orders": [self.theirs.pk, self.mine[0].pk], "status": True},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Order.objects.filter(status=True).count(), 2)
+
+    def test_customer_is_rejected(self):
+        self.client.force_authenticate(user=self.customer)
+        response = self.client.post(
+            "/restaurant/orders/status",
+            {"orders": [self.mine[0].pk], "status": True},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(Order.objects.filter(status=True).exists())
+
+
+@no_throttling
+class ArchiveOrdersTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.customer = User.objects.create_user(username="customer")
+        category = Category.objects.create(slug="mains", title="Mains")
+        self.item = MenuItem.objects.create(
+            title="Pasta", price=10, featured=False, category=category
+        )
+        old = date.today() - timedelta(days=120)
+        self.old_delivered = [self.make_order(old, True) for _ in range(3)]
+        self.old_open = self.make_order(old, False)
+        self.recent = self.make_order(date.today(), True)
+
+    def make_order(self, day, delivered):
+        order = Order.objects.create(
+            user=self.customer, total=10, date=day, status=delivered
+        )
+        OrderItem.objects.create(
+            order=order, menuitem=self.item, quantity=1, unit_price=10, price=10
+        )
+        return order
+
+    def test_archive_moves_old_delivered_orders(self):
+        call_command("archive_orders", days=90, batch_size=2, stdout=StringIO())
+        self.assertEqual(
+            set(ArchivedOrder.objects.values_list("pk", flat=True)),
+            {order.pk for order in self.old_delivered},
+        )
+        self.assertEqual(ArchivedOrderItem.objects.count(), 3)
+        self.assertEqual(
+            set(Order.objects.values_list("pk", flat=True)),
+            {self.old_open.pk, self.recent.pk},
+        )
+        self.assertEqual(OrderItem.objects.count(), 2)
+
+    def test_archive_id_clash_keeps_hot_order(self):
+        ArchivedOrder.objects.create(
+            id=self.old_delivered[0].pk, user=self.customer, total=5, date=date.today()
+        )
+        with self.assertRaises(CommandError):
+            call_command("archive_orders", days=90, stdout=StringIO())
+        self.assertEqual(Order.objects.count(), 5)
+        self.assertEqual(OrderItem.objects.count(), 5)
+        self.assertEqual(ArchivedOrder.objects.get().total, 5)
+
+    def test_history_merges_archive_on_request(self):
+        call_command("archive_orders", days=90, stdout=StringIO())
+        self.client.force_authenticate(user=self.customer)
+        response = self.client.get("/restaurant/orders")
+        self.assertEqual(response.data["count"], 2)
+        response = self.client.get("/restaurant/orders", {"archived": "true"})
+        self.assertEqual(response.data["count"], 5)
+
+    def test_history_pages_through_both_tables(self):
+        call_command("archive_orders", days=90, stdout=StringIO())
+        self.client.force_authenticate(user=self.customer)
+        seen = []
+        for page in (1, 2, 3):
+            response = self.client.get(
+                "/restaurant/orders", {"archived": "true", "page": page}
+            )
+            seen += [item["order"] for item in response.data["results"]]
+        self.assertEqual(
+            seen,
+            sorted(o.pk for o in self.old_delivered + [self.old_open, self.recent]),
+        )
+
+    def test_manager_filters_apply_to_archive(self):
+        manager = User.objects.create_user(username="manager")
+        Group.objects.create(name="Manager").user_set.add(manager)
+        self.recent.total = 50
+        self.recent.save()
+        call_command("archive_orders", days=90, stdout=StringIO())
+        self.client.force_authenticate(user=manager)
+        response = self.client.get(
+            "/restaurant/orders", {"archived": "true", "to_price": 20}
+        )
+        self.assertEqual(response.data["count"], 4)
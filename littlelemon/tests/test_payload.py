@@ -0,0 +1,131 @@
+import gzip
+import json
+from datetime import date
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from rest_framework import status
+from restaurant.models import Category, MenuItem, Cart, Order, OrderItem
+from tests.utils import no_throttling
+
+
+@no_throttling
+class SparseFieldsTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="customer")
+        self.client.force_authenticate(user=self.user)
+        self.item = MenuItem.objects.create(
+            title="Pasta",
+            price=10,
+            featured=False,
+            category=Category.objects.create(slug="mains", title="Mains"),
+        )
+        self.order = Order.objects.create(user=self.user, total=10, date=date.today())
+        OrderItem.objects.create(
+            order=self.order, menuitem=self.item, quantity=1, unit_price=10, price=10
+        )
+
+    def test_ids_by_default(self):
+        row = self.client.get("/restaurant/orders").data["results"][0]
+        self.assertEqual(row["order"], self.order.pk)
+        self.assertEqual(row["menuitem"], self.item.pk)
+
+    def test_expand(self):
+        row = self.client.get("/restaurant/orders", {"expand": "menuitem"}).data[
+            "results"
+        ][0]
+        self.assertEqual(row["order"], self.order.pk)
+        self.assertEqual(row["menuitem"]["title"], "Pasta")
+
+    def test_fields(self):
+        row = self.client.get(
+            "/restaurant/orders", {"fields": "menuitem,quantity", "expand": "menuitem"}
+        ).data["results"][0]
+        self.assertEqual(set(row), {"menuitem", "quantity"})
+        # nested objects keep all their fields
+        self.assertIn("price", row["menuitem"])
+
+    def test_expand_does_not_query_per_row(self):
+        def queries(path):
+            with CaptureQueriesContext(connection) as captured:
+                self.client.get(path, {"expand": "menuitem"})
+            return len(captured)
+
+        Cart.objects.create(
+            user=self.user, menuitem=self.item, quantity=1, unit_price=10, price=10
+        )
+        one = queries("/restaurant/orders"), queries("/restaurant/cart/menu-items")
+        soup = MenuItem.objects.create(
+            title="Soup",
+            price=5,
+            featured=False,
+            category=Category.objects.create(slug="soups", title="Soups"),
+        )
+        OrderItem.objects.create(
+            order=self.order, menuitem=soup, quantity=1, unit_price=5, price=5
+        )
+        Cart.objects.create(
+            user=self.user, menuitem=soup, quantity=1, unit_price=5, price=5
+        )
+        two = queries("/restaurant/orders"), queries("/restaurant/cart/menu-items")
+        self.assertEqual(two, one)
+
+    def test_fields_leave_input_alone(self):
+        self.client.force_authenticate(
+            User.objects.create_user(username="admin", is_staff=True)
+        )
+        response = self.client.post(
+            "/restaurant/menu-items?fields=id",
+            {
+                "title": "Soup",
+                "price": 5,
+                "featured": False,
+                "category": self.item.category_id,
+            },
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(set(response.data), {"id"})
+        self.assertTrue(MenuItem.objects.filter(title="Soup").exists())
+
+
+@no_throttling
+class CompressionMiddlewareTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username="user"))
+        category = Category.objects.create(slug="mains", title="Mains")
+        for n in range(2):
+            MenuItem.objects.create(
+                title="Dish %d %s" % (n, "x" * 600),
+                price=10,
+                featured=False,
+                category=category,
+            )
+
+    def test_large_json_is_gzipped(self):
+        response = self.client.get(
+            "/restaurant/menu-items", HTTP_ACCEPT_ENCODING="gzip"
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(
+            len(json.loads(gzip.decompress(response.content))["results"]), 2
+        )
+
+    def test_small_or_unaccepted_is_left_alone(self):
+        response = self.client.get("/restaurant/menu-items")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        response = self.client.get(
+            "/restaurant/menu-items", {"fields": "id"}, HTTP_ACCEPT_ENCODING="gzip"
+        )
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_gzip_refused_with_zero_q(self):
+        response = self.client.get(
+            "/restaurant/menu-items", HTTP_ACCEPT_ENCODING="gzip;q=0, identity"
+        )
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(len(json.loads(response.content)["results"]), 2)
+        self.assertIn("Accept-Encoding", response["Vary"])
@@ -0,0 +1,52 @@
+from unittest import mock
+from decimal import Decimal
+from django.test import TestCase
+from django.contrib.auth.models import User
+from restaurant.models import Category, MenuItem, Cart
+from restaurant.pricing import reprice_carts
+
+
+class RepriceCartsTest(TestCase):
+    def setUp(self):
+        category = Category.objects.create(slug="mains", title="Mains")
+        self.pasta = MenuItem.objects.create(
+            title="Pasta", price=10, featured=False, category=category
+        )
+        self.salad = MenuItem.objects.create(
+            title="Salad", price=5, featured=False, category=category
+        )
+        for n in range(5):
+            user = User.objects.create_user(username=f"user{n}")
+            for item in (self.pasta, self.salad):
+                Cart.objects.create(
+                    user=user,
+                    menuitem=item,
+                    quantity=n + 1,
+                    unit_price=item.price,
+                    price=item.price * (n + 1),
+                )
+
+    def test_reprice_in_chunks(self):
+        MenuItem.objects.filter(pk=self.pasta.pk).update(price=12)
+        self.assertEqual(reprice_carts(chunk_size=3), 5)
+        for cart in Cart.objects.filter(menuitem=self.pasta):
+            self.assertEqual(cart.unit_price, Decimal("12.00"))
+            self.assertEqual(cart.price, cart.quantity * Decimal("12.00"))
+        self.assertFalse(Cart.objects.filter(menuitem=self.salad).exclude(unit_price=5))
+
+    def test_price_change_triggers_reprice(self):
+        self.pasta.price = Decimal("11.50")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pasta.save()
+        self.assertFalse(
+            Cart.objects.filter(menuitem=self.pasta).exclude(
+                unit_price=Decimal("11.50")
+            )
+        )
+
+    def test_other_changes_do_not_reprice(self):
+        self.pasta.featured = True
+        with mock.patch("restaurant.signals.reprice_carts") as reprice:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.pasta.save()
+        reprice.assert_not_called()
@@ -0,0 +1,66 @@
+import os
+import tempfile
+from io import StringIO
+from django.core.management import call_command, CommandError
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from tests.utils import no_throttling
+
+
+@no_throttling
+class ProfilingMiddlewareTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.staff = User.objects.create_user(username="staff", is_staff=True)
+        self.customer = User.objects.create_user(username="customer")
+
+    def profiles(self):
+        view_dir = os.path.join(self.directory, "OrderView")
+        return os.listdir(view_dir) if os.path.isdir(view_dir) else []
+
+    def get_orders(self, user, **headers):
+        client = APIClient()
+        client.force_login(user)
+        with override_settings(PROFILING_DIR=self.directory):
+            return client.get("/restaurant/orders", **headers)
+
+    def test_staff_header_writes_collapsed_stacks(self):
+        response = self.get_orders(self.staff, HTTP_X_PROFILE="1")
+        self.assertEqual(response.status_code, 200)
+        (name,) = self.profiles()
+        with open(os.path.join(self.directory, "OrderView", name)) as f:
+            lines = f.read().splitlines()
+        self.assertTrue(lines)
+        stack, _, value = lines[0].rpartition(" ")
+        self.assertTrue(value.isdigit())
+        # the whole middleware chain below the profiler hangs off one root
+        self.assertEqual({line.split(" (")[0] for line in lines}, {"profiled"})
+
+        out = StringIO()
+        call_command("profile_report", dir=self.directory, stdout=out)
+        self.assertIn("OrderView: 1 requests", out.getvalue())
+
+        # stray files are skipped, unknown views are reported
+        open(os.path.join(self.directory, "notes.txt"), "w").close()
+        call_command("profile_report", dir=self.directory, stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, "NoSuchView"):
+            call_command(
+                "profile_report", "NoSuchView", dir=self.directory, stdout=StringIO()
+            )
+
+    def test_header_ignored_for_customers(self):
+        self.get_orders(self.customer, HTTP_X_PROFILE="1")
+        self.assertEqual(self.profiles(), [])
+
+    def test_not_sampled_by_default(self):
+        self.get_orders(self.staff)
+        self.assertEqual(self.profiles(), [])
+
+    def test_unresolved_requests_are_profiled_too(self):
+        client = APIClient()
+        client.force_login(self.staff)
+        with override_settings(PROFILING_DIR=self.directory):
+            response = client.get("/restaurant/no-such-page", HTTP_X_PROFILE="1")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(len(os.listdir(os.path.join(self.directory, "unresolved"))), 1)
@@ -0,0 +1,138 @@
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.contrib.auth.models import User, Group
+from rest_framework.test import APIClient
+from rest_framework import status
+from restaurant.models import Category, MenuItem, Cart, Order, UserOrderStats
+from restaurant.stats import month_start
+from tests.utils import no_throttling
+
+
+@no_throttling
+class OrderStatsTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.customer = User.objects.create_user(username="customer")
+        self.driver = User.objects.create_user(username="driver")
+        self.manager = User.objects.create_user(username="manager")
+        Group.objects.create(name="Delivery Crew").user_set.add(self.driver)
+        Group.objects.create(name="Manager").user_set.add(self.manager)
+        self.item = MenuItem.objects.create(
+            title="Pasta",
+            price=10,
+            featured=False,
+            category=Category.objects.create(slug="mains", title="Mains"),
+        )
+
+    def checkout(self, quantity):
+        Cart.objects.create(
+            user=self.customer,
+            menuitem=self.item,
+            quantity=quantity,
+            unit_price=10,
+            price=10 * quantity,
+        )
+        self.client.force_authenticate(user=self.customer)
+        return self.client.post("/restaurant/orders").data["order"]
+
+    def stats(self, user):
+        self.client.force_authenticate(user=user)
+        return self.client.get("/restaurant/orders/stats").data
+
+    def test_counters_follow_checkout_and_deliveries(self):
+        first, second = self.checkout(1), self.checkout(2)
+        self.client.force_authenticate(user=self.manager)
+        for order in (first, second):
+            self.client.patch(
+                f"/restaurant/orders/{order}", {"delivery_crew": self.driver.pk}
+            )
+        self.client.force_authenticate(user=self.driver)
+        self.client.post(
+            "/restaurant/orders/status",
+            {"orders": [first], "status": True},
+            format="json",
+        )
+
+        customer = self.stats(self.customer)
+        self.assertEqual(customer["orders_placed"], 2)
+        self.assertEqual(customer["orders_this_month"], 2)
+        self.assertEqual(Decimal(customer["lifetime_spend"]), 30)
+        driver = self.stats(self.driver)
+        self.assertEqual(driver["open_deliveries"], 1)
+        self.assertEqual(driver["deliveries_completed"], 1)
+
+        self.client.force_authenticate(user=self.manager)
+        self.client.delete(f"/restaurant/orders/{second}")
+        self.assertEqual(self.stats(self.driver)["open_deliveries"], 0)
+        self.assertEqual(self.stats(self.customer)["orders_placed"], 1)
+
+    def test_reconcile_matches_incremental(self):
+        order = self.checkout(3)
+        self.checkout(1)
+        self.client.force_authenticate(user=self.manager)
+        self.client.patch(
+            f"/restaurant/orders/{order}",
+            {"delivery_crew": self.driver.pk, "status": True},
+        )
+        # month is bookkeeping, orders_this_month is what clients see
+        fields = [
+            "user",
+            "orders_placed",
+            "lifetime_spend",
+            "orders_this_month",
+            "open_deliveries",
+            "deliveries_completed",
+        ]
+        expected = list(UserOrderStats.objects.order_by("user").values(*fields))
+        UserOrderStats.objects.update(orders_placed=0, deliveries_completed=7)
+        call_command("reconcile_order_stats", stdout=StringIO())
+        self.assertEqual(
+            list(UserOrderStats.objects.order_by("user").values(*fields)), expected
+        )
+
+    def test_reconcile_creates_missing_rows(self):
+        order = self.checkout(2)
+        self.client.force_authenticate(user=self.manager)
+        self.client.patch(
+            f"/restaurant/orders/{order}", {"delivery_crew": self.driver.pk}
+        )
+        UserOrderStats.objects.filter(user=self.customer).delete()
+        call_command("reconcile_order_stats", stdout=StringIO())
+        self.assertEqual(
+            sorted(UserOrderStats.objects.values_list("user", flat=True)),
+            [self.customer.pk, self.driver.pk],
+        )
+        self.assertEqual(self.stats(self.customer)["orders_placed"], 1)
+        self.assertEqual(self.stats(self.driver)["open_deliveries"], 1)
+
+    def test_deleting_uncounted_orders(self):
+        # orders from before the counters existed, with counters at zero
+        orders = [
+            Order.objects.create(
+                user=self.customer,
+                delivery_crew=self.driver,
+                status=delivered,
+                total=10,
+                date=date.today(),
+            )
+            for delivered in (False, True)
+        ]
+        UserOrderStats.objects.create(user=self.customer, month=month_start())
+        UserOrderStats.objects.create(user=self.driver)
+        self.client.force_authenticate(user=self.manager)
+        for order in orders:
+            response = self.client.delete(f"/restaurant/orders/{order.pk}")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        customer = self.stats(self.customer)
+        self.assertEqual(customer["orders_placed"], 0)
+        self.assertEqual(customer["orders_this_month"], 0)
+        self.assertEqual(Decimal(customer["lifetime_spend"]), 0)
+        driver = self.stats(self.driver)
+        self.assertEqual(driver["open_deliveries"], 0)
+        self.assertEqual(driver["deliveries_completed"], 0)
+
+    def test_no_orders(self):
+        self.assertEqual(self.stats(self.customer)["orders_placed"], 0)
@@ -0,0 +1,110 @@
+from io import StringIO
+from django.core import mail
+from django.core.management import call_command
+from django.test import TransactionTestCase
+from django.contrib.auth.models import User, Group
+from rest_framework.test import APIClient
+from restaurant.models import Category, MenuItem, Cart, Order, Task
+from restaurant.tasks import task, enqueue, claim, run
+from tests.utils import no_throttling
+
+calls = []
+
+
+@task("flaky")
+def flaky(fail_times):
+    calls.append(fail_times)
+    if len(calls) <= fail_times:
+        raise RuntimeError("try again")
+
+
+@no_throttling
+class TaskQueueTest(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_idempotency_key(self):
+        first = enqueue("flaky", {"fail_times": 0}, key="once")
+        second = enqueue("flaky", {"fail_times": 0}, key="once")
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_retry_then_fail(self):
+        enqueue("flaky", {"fail_times": 5}, max_attempts=2)
+        call_command("run_tasks", once=True, stdout=StringIO())
+        task = Task.objects.get()
+        self.assertEqual(task.status, Task.PENDING)
+        self.assertEqual(task.attempts, 1)
+        # make the retry due now
+        Task.objects.update(run_after=task.created)
+        call_command("run_tasks", once=True, stdout=StringIO())
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.FAILED)
+        self.assertIn("try again", task.last_error)
+        self.assertEqual(len(calls), 2)
+
+    def test_checkout_and_status_change_enqueue(self):
+        client = APIClient()
+        customer = User.objects.create_user(username="customer", email="c@x.com")
+        manager = User.objects.create_user(username="manager")
+        Group.objects.create(name="Manager").user_set.add(manager)
+        item = MenuItem.objects.create(
+            title="Pasta",
+            price=10,
+            featured=False,
+            category=Category.objects.create(slug="mains", title="Mains"),
+        )
+        Cart.objects.create(
+            user=customer, menuitem=item, quantity=1, unit_price=10, price=10
+        )
+        client.force_authenticate(user=customer)
+        order = client.post("/restaurant/orders").data["order"]
+        client.force_authenticate(user=manager)
+        client.patch(f"/restaurant/orders/{order}", {"status": True})
+        client.patch(f"/restaurant/orders/{order}", {"status": True})
+        self.assertEqual(
+            sorted(Task.objects.values_list("name", flat=True)),
+            ["notify_order_status", "send_order_receipt"],
+        )
+
+        call_command("run_tasks", once=True, threads=2, stdout=StringIO())
+        self.assertEqual(Task.objects.filter(status=Task.DONE).count(), 2)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertTrue(Order.objects.get(pk=order).status)
+
+    def test_every_status_change_is_notified(self):
+        client = APIClient()
+        customer = User.objects.create_user(username="customer")
+        manager = User.objects.create_user(username="manager")
+        Group.objects.create(name="Manager").user_set.add(manager)
+        order = Order.objects.create(user=customer, total=10, date="2024-01-01")
+        client.force_authenticate(user=manager)
+        for delivered in (True, False, True, False):
+            client.patch(f"/restaurant/orders/{order.pk}", {"status": delivered})
+        self.assertEqual(
+            list(
+                Task.objects.filter(name="notify_order_status")
+                .order_by("pk")
+                .values_list("payload__status", flat=True)
+            ),
+            [True, False, True, False],
+        )
+
+    def test_lease_expired_on_last_attempt_fails(self):
+        task = enqueue("flaky", {"fail_times": 0}, max_attempts=2)
+        Task.objects.filter(pk=task.pk).update(status=Task.RUNNING, attempts=2)
+        self.assertEqual(claim(4), [])
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.FAILED, 2))
+        self.assertEqual(calls, [])
+
+    def test_stale_worker_leaves_reclaimed_task_alone(self):
+        task = enqueue("flaky", {"fail_times": 5})
+        ((pk, attempts),) = claim(1)
+        # the lease runs out and another worker claims the task again
+        Task.objects.filter(pk=pk).update(run_after=task.created)
+        self.assertEqual(claim(1), [(pk, attempts + 1)])
+        self.assertFalse(run(pk, attempts))
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.RUNNING, 2))
+        self.assertFalse(run(pk + 1, 1))
@@ -1,3 +1,4 @@
+from io import StringIO
 from django.test import TestCase
 from django.contrib.auth.models import User, Group
 from rest_framework.test import APIClient
@@ -5,8 +6,11 @@ from rest_framework import status
 from restaurant.models import MenuItem, Menu
 from restaurant.serializers import MenuItemSerializer
 from django.urls import reverse
+from django.core.management import call_command
+from tests.utils import no_throttling
 
 
+@no_throttling
 class MenuItemViewTest(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -81,6 +85,7 @@ class MenuItemViewTest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
 
+@no_throttling
 class MenuViewTest(TestCase):
     def setUp(self):
         Menu.objects.create(title="fsoulia", price=15.5, inventory=20)
@@ -105,3 +110,15 @@ class MenuViewTest(TestCase):
         self.assertEqual(response.data[1]["title"], "Mashawe")
         self.assertEqual(float(response.data[1]["price"]), 65.0)
         self.assertEqual(response.data[1]["inventory"], 60)
+
+
+class ViewsImportTest(TestCase):
+    def test_import_does_not_query(self):
+        # URL loading imports the views, it must work on an empty database;
+        # startup_profile imports them in a fresh interpreter and fails on
+        # any query
+        out = StringIO()
+        call_command(
+            "startup_profile", "littlelemon.urls", "restaurant.views", top=0, stdout=out
+        )
+        self.assertEqual(out.getvalue().count(", 0 db queries"), 2)
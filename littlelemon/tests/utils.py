@@ -0,0 +1,8 @@
+from django.test import override_settings
+
+# DRF reads the throttle classes and rates once, at import, so overriding
+# REST_FRAMEWORK can't turn them off; a dummy cache keeps no request history,
+# which lets every request through. Use it on test cases that call the API.
+no_throttling = override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+)